@@ -2,10 +2,17 @@
 #Purpose: Statistical analysis Demo
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import re
+import warnings
+from functools import lru_cache
 from datetime import date
-import matplotlib.pyplot as plt
 import json
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 #Steps
@@ -14,13 +21,24 @@ from pathlib import Path
 OUTPUT_DIR = Path("/Users/shweta/PyCharmMiscProject/clinical data/analysis_outputs")
 PLOTS_DIR = OUTPUT_DIR / "plots"
 TABLES_DIR = OUTPUT_DIR / "tables"
+CACHE_DIR = OUTPUT_DIR / "cache"
 
 PLOTS_DIR.mkdir(parents=True, exist_ok=True)
 TABLES_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 PATIENTS_CSV = "/Users/shweta/PyCharmMiscProject/clinical data/patients.csv"
 CONDITIONS_CSV = "/Users/shweta/PyCharmMiscProject/clinical data/conditions.csv"
 
+# Heuristic list; tune for your org's definition of "clinical only"
+DEFAULT_EXCLUDE_KEYWORDS = [
+    "employment", "full-time", "part-time", "labor force", "occupation",
+    "social", "social isolation", "limited social contact",
+    "housing", "homeless", "education", "school",
+    "medication review", "review due", "screening", "counseling",
+    "referral", "administrative", "situation", "finding of",
+]
+
 # -----------------------------
 # Helpers
 # -----------------------------
@@ -28,17 +46,149 @@ CONDITIONS_CSV = "/Users/shweta/PyCharmMiscProject/clinical data/conditions.csv"
 def to_dt(s):
     return pd.to_datetime(s, errors="coerce")
 
+def _coerce_dates(df, date_columns):
+    for c in date_columns:
+        df[c] = to_dt(df[c])
+    return df
+
+def _csv_convert_options(columns, date_columns=(), category_columns=()):
+    column_types = {c: pa.string() for c in columns}
+    column_types.update({c: pa.timestamp("ns") for c in date_columns})
+    column_types.update({c: pa.dictionary(pa.int32(), pa.string()) for c in category_columns})
+    return pacsv.ConvertOptions(
+        include_columns=list(columns),
+        include_missing_columns=True,
+        strings_can_be_null=True,
+        column_types=column_types,
+        # Strict ISO8601 only: a strptime format would roll 1985-02-30 into March
+        timestamp_parsers=[pacsv.ISO8601],
+    )
+
+def read_csv_columns(path, columns, date_columns=(), category_columns=()):
+    """
+    Read only 'columns' from a CSV with Arrow's multithreaded reader.
+    Every column gets its final type while parsing: date_columns become
+    datetime64, category_columns are dictionary-encoded into pandas
+    categoricals and the rest are strings. Columns absent from the file
+    (e.g. DEATHDATE) come back as all-null. If Arrow rejects a date
+    (malformed, impossible or timezone-suffixed), dates are re-read as text
+    and coerced like pd.to_datetime(errors="coerce"), bad values -> NaT.
+    """
+    try:
+        convert_options = _csv_convert_options(columns, date_columns, category_columns)
+        return pacsv.read_csv(path, convert_options=convert_options).to_pandas()
+    except pa.ArrowInvalid:
+        convert_options = _csv_convert_options(columns, (), category_columns)
+        df = pacsv.read_csv(path, convert_options=convert_options).to_pandas()
+        return _coerce_dates(df, date_columns)
+
+def _reader_settings(reader):
+    # partial(...) readers: function name plus bound arguments; else the name
+    if isinstance(reader, partial):
+        return repr((reader.func.__name__, reader.args, sorted(reader.keywords.items())))
+    return getattr(reader, "__name__", repr(reader))
+
+def load_csv_cached(csv_path, parquet_path, reader, key=""):
+    """
+    Return reader(csv_path), reusing a Parquet copy while the CSV is unchanged.
+    The cache is keyed on the CSV's size and mtime, the reader's settings
+    (columns, dtypes, filters for a partial), and an optional extra 'key'
+    for anything else that changes the result.
+    """
+    st = os.stat(csv_path)
+    tag = f"{st.st_size}-{st.st_mtime_ns}-{_reader_settings(reader)}-{key}"
+    meta = parquet_path.with_suffix(".tag")
+    if parquet_path.exists() and meta.exists() and meta.read_text() == tag:
+        return pd.read_parquet(parquet_path)
+    df = reader(csv_path)
+    df.to_parquet(parquet_path, compression="zstd", index=False)
+    meta.write_text(tag)
+    return df
+
+def top_k(df, column, k):
+    """
+    The k rows of df with the largest 'column', largest first.
+    np.partition finds the k-th largest value in O(n), so only the k
+    selected rows get sorted; ties keep their original row order, as with
+    nlargest(keep="first").
+    """
+    values = df[column].to_numpy()
+    if len(values) > k:
+        kth = -np.partition(-values, k - 1)[k - 1]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[: k - len(above)]
+        idx = np.sort(np.concatenate([above, ties]))
+    else:
+        idx = np.arange(len(values))
+    idx = idx[np.argsort(-values[idx], kind="stable")]
+    return df.iloc[idx]
+
+def write_csv(df, path):
+    """
+    Write df to CSV (no index) through a 1 MiB file buffer.
+    """
+    with open(path, "wb", buffering=1 << 20) as f:
+        df.to_csv(f, index=False, lineterminator="\n")
+
 def compute_age_years(birthdate, as_of):
     """
     Exact age in years as of 'as_of' (date or Timestamp), handling NaT.
     """
     if pd.isna(birthdate):
         return np.nan
-    b = pd.Timestamp(birthdate).date()
-    a = pd.Timestamp(as_of).date()
+    # Timestamp accepts str/date/datetime64 inputs; skip the extra .date() objects
+    b = pd.Timestamp(birthdate)
+    a = pd.Timestamp(as_of)
     years = a.year - b.year - ((a.month, a.day) < (b.month, b.day))
     return years
 
+def compute_ages_vectorized(birthdates, as_of):
+    """
+    Vectorized exact age in years as of 'as_of' for a datetime64 Series.
+    Returns a nullable Int16 Series; NaT birthdates give <NA>.
+    """
+    as_of = pd.Timestamp(as_of)
+    missing = birthdates.isna().to_numpy()
+    # NaT fields are read as 0 and masked by 'missing'; no fill value needed,
+    # so tz-aware columns (from the to_dt fallback) work too
+    b_y = birthdates.dt.year.fillna(0).to_numpy(dtype=np.int64)
+    b_m = birthdates.dt.month.fillna(0).to_numpy(dtype=np.int64)
+    b_d = birthdates.dt.day.fillna(0).to_numpy(dtype=np.int64)
+    # Birthday not yet reached this year -> subtract one
+    not_yet = (b_m > as_of.month) | ((b_m == as_of.month) & (b_d > as_of.day))
+    ages = (as_of.year - b_y - not_yet).astype(np.int16)
+    return pd.Series(pd.arrays.IntegerArray(ages, missing), index=birthdates.index)
+
+@lru_cache(maxsize=None)
+def _compile_clinical_patterns(exclude_keywords, exclude_regex, include_regex):
+    # Longest keywords first so overlapping alternatives resolve on the first try
+    keywords = sorted((k for k in exclude_keywords if k), key=lambda k: -len(k))
+    kw_pattern = r"|".join([re.escape(k) for k in keywords])
+
+    parts = []
+    if kw_pattern:
+        parts.append(rf"(?:{kw_pattern})")
+    if exclude_regex:
+        parts.append(rf"(?:{exclude_regex})")
+
+    excl_re = re.compile(r"|".join(parts), flags=re.IGNORECASE) if parts else None
+    incl_re = re.compile(include_regex, flags=re.IGNORECASE) if include_regex else None
+    return excl_re, incl_re
+
+def compile_clinical_patterns(
+    exclude_keywords=None,
+    exclude_regex=None,
+    include_regex=None,
+):
+    """
+    Returns (exclude_re, include_re), either of which may be None.
+    Keywords and exclude_regex are fused into one case-insensitive alternation;
+    results are cached so repeated filters reuse the compiled patterns.
+    """
+    if exclude_keywords is None:
+        exclude_keywords = DEFAULT_EXCLUDE_KEYWORDS
+    return _compile_clinical_patterns(tuple(exclude_keywords), exclude_regex, include_regex)
+
 def build_clinical_filter(
     exclude_keywords=None,
     exclude_regex=None,
@@ -49,22 +199,7 @@ def build_clinical_filter(
     - include_regex: if provided, descriptions must match this to be kept
     - exclude_keywords/exclude_regex: descriptions matching are removed
     """
-    if exclude_keywords is None:
-        # Heuristic list; tune for your org's definition of "clinical only"
-        exclude_keywords = [
-            "employment", "full-time", "part-time", "labor force", "occupation",
-            "social", "social isolation", "limited social contact",
-            "housing", "homeless", "education", "school",
-            "medication review", "review due", "screening", "counseling",
-            "referral", "administrative", "situation", "finding of",
-        ]
-
-    # Build one regex from keywords (case-insensitive)
-    kw_pattern = r"|".join([re.escape(k) for k in exclude_keywords if k])
-    kw_re = re.compile(kw_pattern, flags=re.IGNORECASE) if kw_pattern else None
-
-    ex_re = re.compile(exclude_regex, flags=re.IGNORECASE) if exclude_regex else None
-    in_re = re.compile(include_regex, flags=re.IGNORECASE) if include_regex else None
+    excl_re, in_re = compile_clinical_patterns(exclude_keywords, exclude_regex, include_regex)
 
     def is_clinical(desc: str) -> bool:
         if desc is None or (isinstance(desc, float) and np.isnan(desc)):
@@ -77,174 +212,332 @@ def build_clinical_filter(
         if in_re and not in_re.search(d):
             return False
 
-        # Exclusions
-        if kw_re and kw_re.search(d):
-            return False
-        if ex_re and ex_re.search(d):
+        # Exclusions (keywords + exclude_regex in one pass)
+        if excl_re and excl_re.search(d):
             return False
 
         return True
 
     return is_clinical
 
+def clinical_mask(
+    descriptions,
+    exclude_keywords=None,
+    exclude_regex=None,
+    include_regex=None,
+):
+    """
+    Vectorized equivalent of build_clinical_filter(...) applied to a Series.
+    Returns a boolean Series aligned with 'descriptions'.
+    """
+    if isinstance(descriptions.dtype, pd.CategoricalDtype):
+        # Evaluate each distinct description once and index by the codes;
+        # the trailing False is picked up by code -1 (missing)
+        categories = pd.Series(descriptions.cat.categories)
+        cat_mask = clinical_mask(categories, exclude_keywords, exclude_regex, include_regex)
+        cat_mask = np.append(cat_mask.to_numpy(), False)
+        return pd.Series(cat_mask[descriptions.cat.codes.to_numpy()], index=descriptions.index)
+
+    excl_re, incl_re = compile_clinical_patterns(exclude_keywords, exclude_regex, include_regex)
+
+    desc = descriptions.astype(pd.StringDtype("python")).fillna("").str.strip()
+    mask = desc != ""
+
+    with warnings.catch_warnings():
+        # Capture groups in user regexes are harmless for a boolean match
+        warnings.filterwarnings("ignore", "This pattern .* has match groups")
+        if incl_re:
+            mask &= desc.str.contains(incl_re, regex=True, na=False)
+        if excl_re:
+            mask &= ~desc.str.contains(excl_re, regex=True, na=False)
+
+    return mask.astype(bool)
+
+def _read_clinical_blocks(path, convert_options, block_size, filter_kwargs):
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=convert_options,
+    )
+    parts = []
+    for batch in reader:
+        mask = clinical_mask(batch.column("DESCRIPTION").to_pandas(), **filter_kwargs)
+        parts.append(batch.filter(pa.array(mask.to_numpy())))
+
+    # Each block has its own dictionaries; unify them so categoricals concatenate
+    return pa.Table.from_batches(parts, schema=reader.schema).unify_dictionaries()
+
+def read_clinical_conditions(
+    path, columns, date_columns=(), category_columns=(), block_size=64 << 20, **filter_kwargs
+):
+    """
+    Stream a conditions CSV block by block, keeping only clinical rows.
+    Column typing (including the date fallback) is as in read_csv_columns();
+    filter_kwargs are passed to clinical_mask(). Peak memory scales with the
+    clinical subset rather than the whole file.
+    """
+    try:
+        convert_options = _csv_convert_options(columns, date_columns, category_columns)
+        df = _read_clinical_blocks(path, convert_options, block_size, filter_kwargs).to_pandas()
+    except pa.ArrowInvalid:
+        convert_options = _csv_convert_options(columns, (), category_columns)
+        df = _read_clinical_blocks(path, convert_options, block_size, filter_kwargs).to_pandas()
+        df = _coerce_dates(df, date_columns)
+
+    # Drop categories that only occurred in filtered-out rows
+    for c in category_columns:
+        df[c] = df[c].cat.remove_unused_categories()
+    return df
+
+parser = argparse.ArgumentParser(description="Descriptive statistics on Synthea patients and conditions")
+parser.add_argument(
+    "--jobs", type=int, default=1,
+    help="threads for the independent analysis sections (default: 1, sequential)",
+)
+parser.add_argument(
+    "--plots", action="store_true",
+    help=f"save PNG plots to {PLOTS_DIR}",
+)
+args = parser.parse_args()
+
+# Plots are only built (and matplotlib only imported) when saving them
+SAVE_PLOTS = args.plots
+if SAVE_PLOTS:
+    import matplotlib
+    matplotlib.use("Agg")
+    matplotlib.set_loglevel("warning")
+    import matplotlib.pyplot as plt
+
 # -----------------------------
 # Load data
 # -----------------------------
-patients = pd.read_csv(PATIENTS_CSV)
-conditions = pd.read_csv(CONDITIONS_CSV)
+# Parsed inputs are cached as Parquet and reused until the CSVs change
+patients = load_csv_cached(
+    PATIENTS_CSV,
+    CACHE_DIR / "patients.parquet",
+    partial(
+        read_csv_columns,
+        columns=["Id", "BIRTHDATE", "DEATHDATE", "GENDER"],
+        date_columns=["BIRTHDATE", "DEATHDATE"],
+        category_columns=["GENDER"],
+    ),
+)
+
+# Clinical-only filter (tune exclude list / regex to your needs)
+clinical_filter = dict(
+    # exclude_regex example: exclude anything that clearly looks non-clinical
+    exclude_regex=r"\b(employment|labor force|social|medication review|administrative)\b",
+    # include_regex example (optional): keep only disorders/diseases if your text has that pattern
+    # include_regex=r"\((disorder|disease)\)$",
+)
+
+# Keep only clinical diagnoses; non-clinical rows are dropped while streaming
+clinical_conditions = load_csv_cached(
+    CONDITIONS_CSV,
+    CACHE_DIR / "clinical_conditions.parquet",
+    partial(
+        read_clinical_conditions,
+        columns=["PATIENT", "DESCRIPTION", "START", "STOP"],
+        date_columns=["START", "STOP"],
+        category_columns=["DESCRIPTION"],
+        **clinical_filter,
+    ),
+    # Filter settings are keyed via the partial; defaults aren't, so add them
+    key=repr(DEFAULT_EXCLUDE_KEYWORDS),
+)
 #print(patients.columns )
-patients["BIRTHDATE"] = to_dt(patients["BIRTHDATE"])
-patients["DEATHDATE"] = to_dt(patients.get("DEATHDATE"))
-conditions["START"] = to_dt(conditions["START"])
-conditions["STOP"] = to_dt(conditions.get("STOP"))
 
 # -----------------------------
-# Age analysis
+# Prepare shared columns
 # -----------------------------
 analysis_date = pd.Timestamp(date.today())  # change if you want a fixed date
-patients["AGE"] = patients["BIRTHDATE"].apply(lambda x: compute_age_years(x, analysis_date))
+patients["AGE"] = compute_ages_vectorized(patients["BIRTHDATE"], analysis_date)
 
 # Optional: exclude deceased if you want "current living population"
 # patients_live = patients[patients["DEATHDATE"].isna()].copy()
-patients_live = patients.copy()
+# Alias rather than copy: only AGE_GROUP is added below, and patients isn't reused
+patients_live = patients
 
 # Age bins (customize as needed)
 age_bins = [0, 18, 40, 65, 120]
 age_labels = ["0-17", "18-39", "40-64", "65+"]
-patients_live["AGE_GROUP"] = pd.cut(patients_live["AGE"], bins=age_bins, labels=age_labels, right=False)
-
-age_summary = {
-    "patients_count": int(patients_live["Id"].nunique()),
-    "mean_age": float(patients_live["AGE"].mean()),
-    "median_age": float(patients_live["AGE"].median()),
-    "min_age": float(patients_live["AGE"].min()),
-    "max_age": float(patients_live["AGE"].max()),
-}
-age_dist = (
-    patients_live["AGE_GROUP"]
-    .value_counts(dropna=False)
-    .rename_axis("AGE_GROUP")
-    .reset_index(name="COUNT")
+ages = patients_live["AGE"].to_numpy(dtype="float64", na_value=np.nan)
+# Bin index = number of upper edges <= age (same as right=False bins);
+# missing or out-of-range ages get code -1
+age_codes = np.searchsorted(
+    np.array(age_bins[1:]), np.nan_to_num(ages, nan=-1), side="right"
+).astype(np.int8)
+age_codes[np.isnan(ages) | (ages < age_bins[0]) | (ages >= age_bins[-1])] = -1
+patients_live["AGE_GROUP"] = pd.Categorical.from_codes(age_codes, categories=age_labels)
+
+# Far fewer unique descriptions/patients than rows: group and count on int codes
+# (DESCRIPTION is already categorical from the read)
+clinical_conditions["PATIENT"] = clinical_conditions["PATIENT"].astype("category")
+
+# Single pass over the clinical rows: records per (diagnosis, patient) pair.
+# Both per-diagnosis tallies and the gender stratification derive from it.
+# dropna=False keeps rows with a missing PATIENT in the record counts.
+dx_patient = (
+    clinical_conditions.groupby(["DESCRIPTION", "PATIENT"], observed=True, sort=False, dropna=False)
+    .size()
+    .rename("RECORDS")
+    .reset_index()
 )
-age_dist["PCT"] = (age_dist["COUNT"] / age_dist["COUNT"].sum() * 100).round(1)
 
+# -----------------------------
+# Analysis sections
+# -----------------------------
+# Each section only reads the frames above and writes its own tables, so
+# they can run concurrently (pandas releases the GIL in its C kernels).
+
+def compute_age_outputs(patients_live):
+    # Float view so all-missing/empty ages give NaN rather than pd.NA
+    ages = patients_live["AGE"].astype("float64")
+    age_summary = {
+        "patients_count": int(patients_live["Id"].nunique()),
+        "mean_age": float(ages.mean()),
+        "median_age": float(ages.median()),
+        "min_age": float(ages.min()),
+        "max_age": float(ages.max()),
+    }
+    age_codes = patients_live["AGE_GROUP"].cat.codes.to_numpy()
+    age_dist = pd.DataFrame({
+        "AGE_GROUP": age_labels,
+        "COUNT": np.bincount(age_codes[age_codes >= 0], minlength=len(age_labels)),
+    })
+    n_unbinned = int((age_codes < 0).sum())
+    if n_unbinned:
+        age_dist = pd.concat(
+            [age_dist, pd.DataFrame({"AGE_GROUP": [np.nan], "COUNT": [n_unbinned]})],
+            ignore_index=True,
+        )
+    age_dist["PCT"] = (age_dist["COUNT"] / age_dist["COUNT"].sum() * 100).round(1)
+
+    # Save age summary
+    with open(OUTPUT_DIR / "age_summary.json", "w") as f:
+        json.dump(age_summary, f, indent=2)
+
+    # Save age distribution table
+    write_csv(age_dist, TABLES_DIR / "age_distribution.csv")
+    return age_summary, age_dist
+
+def compute_gender_outputs(patients_live):
+    # One row per patient, so a plain value tally replaces groupby/nunique
+    genders = patients_live["GENDER"].to_numpy(dtype=object, na_value="UNK")
+    gender_vals, gender_counts = np.unique(genders, return_counts=True)
+    order = np.argsort(-gender_counts, kind="stable")
+    gender_dist = pd.DataFrame({"GENDER": gender_vals[order], "COUNT": gender_counts[order]})
+    gender_dist["PCT"] = (gender_dist["COUNT"] / gender_counts.sum() * 100).round(1)
+
+    write_csv(gender_dist, TABLES_DIR / "gender_distribution.csv")
+    return gender_dist
+
+def compute_dx_outputs(dx_patient):
+    dx_agg = dx_patient.groupby("DESCRIPTION", observed=True, sort=False).agg(
+        RECORDS=("RECORDS", "sum"),
+        UNIQUE_PATIENTS=("PATIENT", "count"),  # count skips the missing-PATIENT pair
+    )
+
+    # Top diagnoses by UNIQUE PATIENT count (preferred)
+    top_dx_by_patients = top_k(dx_agg, "UNIQUE_PATIENTS", 20)["UNIQUE_PATIENTS"].reset_index()
+
+    # Top diagnoses by RECORD count (secondary)
+    top_dx_by_records = top_k(dx_agg, "RECORDS", 20)["RECORDS"].reset_index()
+
+    write_csv(top_dx_by_patients, TABLES_DIR / "top_clinical_diagnoses_by_patient.csv")
+    return top_dx_by_patients, top_dx_by_records
+
+def compute_strat_outputs(dx_patient, patients_live):
+    # Link (diagnosis, patient) pairs to patient demographics
+    # Join on the PATIENT category codes instead of hashing 36-char UUIDs;
+    # patients with no clinical rows get code -1 and are dropped up front
+    patient_codes = dx_patient["PATIENT"].cat.categories.get_indexer(patients_live["Id"])
+    demo = patients_live[["Id", "GENDER", "AGE", "AGE_GROUP"]].assign(_pid=patient_codes)
+    demo = demo[demo["_pid"] >= 0]
+    dx_demo = (
+        dx_patient.assign(_pid=dx_patient["PATIENT"].cat.codes)
+        .merge(demo, on="_pid", how="left")
+        .drop(columns="_pid")
+    )
+
+    # Example: top 10 diagnoses within each gender (unique patients);
+    # dx_demo already has one row per (diagnosis, patient)
+    dx_by_gender = (
+        dx_demo.groupby(["GENDER", "DESCRIPTION"], observed=True, sort=False)
+        .size()
+        .rename("UNIQUE_PATIENTS")
+        .reset_index()
+    )
+    # Keep only each gender's top 10 before the (now small) display sort
+    top_dx_by_gender = (
+        dx_by_gender.sort_values("UNIQUE_PATIENTS", ascending=False)
+        .groupby("GENDER", observed=True, sort=False)
+        .head(10)
+        .sort_values(["GENDER", "UNIQUE_PATIENTS"], ascending=[True, False])
+    )
+
+    # Parquet keeps the categorical columns
+    top_dx_by_gender.to_parquet(TABLES_DIR / "top_clinical_diagnoses_by_gender.parquet", index=False)
+    return top_dx_by_gender
+
+# Threads rather than processes: the frames are shared, never pickled
+with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as ex:
+    f_age = ex.submit(compute_age_outputs, patients_live)
+    f_gen = ex.submit(compute_gender_outputs, patients_live)
+    f_dx = ex.submit(compute_dx_outputs, dx_patient)
+    f_strat = ex.submit(compute_strat_outputs, dx_patient, patients_live)
+
+age_summary, age_dist = f_age.result()
+gender_dist = f_gen.result()
+top_dx_by_patients, top_dx_by_records = f_dx.result()
+top_dx_by_gender = f_strat.result()
+
+# -----------------------------
+# Report (printing and plotting stay on the main thread)
+# -----------------------------
 print("=== AGE SUMMARY ===")
 print(age_summary)
 print("\n=== AGE DISTRIBUTION (BINS) ===")
 print(age_dist)
 
 # Optional plot: age histogram
-plt.figure()
-patients_live["AGE"].dropna().plot(kind="hist", bins=20, title="Age distribution")
-plt.xlabel("Age (years)")
-plt.tight_layout()
-#plt.show()
-
-# Save age summary
-with open(OUTPUT_DIR / "age_summary.json", "w") as f:
-    json.dump(age_summary, f, indent=2)
-
-# Save age distribution table
-age_dist.to_csv(TABLES_DIR / "age_distribution.csv", index=False)
-
-# -----------------------------
-# Gender analysis
-# -----------------------------
-gender_dist = (
-    patients_live.groupby("GENDER")["Id"]
-    .nunique()
-    .sort_values(ascending=False)
-    .rename("COUNT")
-    .reset_index()
-)
-gender_dist["PCT"] = (gender_dist["COUNT"] / gender_dist["COUNT"].sum() * 100).round(1)
+if SAVE_PLOTS:
+    plt.figure()
+    patients_live["AGE"].dropna().plot(kind="hist", bins=20, title="Age distribution")
+    plt.xlabel("Age (years)")
+    plt.tight_layout()
+    plt.savefig(PLOTS_DIR / "age_histogram.png", dpi=100)
+    plt.close()
 
 print("\n=== GENDER DISTRIBUTION ===")
 print(gender_dist)
-gender_dist.to_csv(TABLES_DIR / "gender_distribution.csv", index=False)
 
 # Optional plot: gender bar chart
-plt.figure()
-gender_dist.set_index("GENDER")["COUNT"].plot(kind="bar", title="Patients by gender")
-plt.ylabel("Unique patients")
-plt.tight_layout()
-#plt.show()
-
-
-# -----------------------------
-# Diagnosis analysis (clinical-only filter)
-# -----------------------------
-# Build clinical-only filter (tune exclude list / regex to your needs)
-is_clinical = build_clinical_filter(
-    # exclude_regex example: exclude anything that clearly looks non-clinical
-    exclude_regex=r"\b(employment|labor force|social|medication review|administrative)\b",
-    # include_regex example (optional): keep only disorders/diseases if your text has that pattern
-    # include_regex=r"\((disorder|disease)\)$",
-)
-
-conditions["IS_CLINICAL"] = conditions["DESCRIPTION"].apply(is_clinical)
-
-# Keep only clinical diagnoses
-clinical_conditions = conditions[conditions["IS_CLINICAL"]].copy()
-
-# Top diagnoses by UNIQUE PATIENT count (preferred)
-top_dx_by_patients = (
-    clinical_conditions.groupby("DESCRIPTION")["PATIENT"]
-    .nunique()
-    .sort_values(ascending=False)
-    .head(20)
-    .rename("UNIQUE_PATIENTS")
-    .reset_index()
-)
-
-# Top diagnoses by RECORD count (secondary)
-top_dx_by_records = (
-    clinical_conditions["DESCRIPTION"]
-    .value_counts()
-    .head(20)
-    .rename_axis("DESCRIPTION")
-    .reset_index(name="RECORDS")
-)
+if SAVE_PLOTS:
+    plt.figure()
+    gender_dist.set_index("GENDER")["COUNT"].plot(kind="bar", title="Patients by gender")
+    plt.ylabel("Unique patients")
+    plt.tight_layout()
+    plt.savefig(PLOTS_DIR / "gender_distribution.png", dpi=100)
+    plt.close()
 
 print("\n=== TOP CLINICAL DIAGNOSES (by unique patients) ===")
 print(top_dx_by_patients)
 
 print("\n=== TOP CLINICAL DIAGNOSES (by record count) ===")
 print(top_dx_by_records)
-top_dx_by_patients.to_csv(
-    TABLES_DIR / "top_clinical_diagnoses_by_patient.csv",
-    index=False
-)
 
 # Optional plot: top diagnoses by unique patients
-plt.figure()
-top_dx_by_patients.set_index("DESCRIPTION")["UNIQUE_PATIENTS"].sort_values().plot(
-    kind="barh",
-    title="Top clinical diagnoses (unique patients)"
-)
-plt.xlabel("Unique patients")
-plt.tight_layout()
-#plt.show()
-
-# -----------------------------
-# Optional: Stratify diagnoses by age group / gender
-# -----------------------------
-# Link diagnoses to patient demographics
-dx_demo = clinical_conditions.merge(
-    patients_live[["Id", "GENDER", "AGE", "AGE_GROUP"]],
-    left_on="PATIENT",
-    right_on="Id",
-    how="left"
-)
-
-# Example: top diagnoses within each gender (unique patients)
-top_dx_by_gender = (
-    dx_demo.groupby(["GENDER", "DESCRIPTION"])["PATIENT"]
-    .nunique()
-    .rename("UNIQUE_PATIENTS")
-    .reset_index()
-    .sort_values(["GENDER", "UNIQUE_PATIENTS"], ascending=[True, False])
-)
+if SAVE_PLOTS:
+    plt.figure()
+    top_dx_by_patients.set_index("DESCRIPTION")["UNIQUE_PATIENTS"].sort_values().plot(
+        kind="barh",
+        title="Top clinical diagnoses (unique patients)"
+    )
+    plt.xlabel("Unique patients")
+    plt.tight_layout()
+    plt.savefig(PLOTS_DIR / "top_clinical_diagnoses_by_patient.png", dpi=100)
+    plt.close()
 
 print("\n=== (OPTIONAL) DIAGNOSES BY GENDER (unique patients) ===")
-print(top_dx_by_gender.head(50))
+print(top_dx_by_gender)